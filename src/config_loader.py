@@ -2,9 +2,34 @@
 Config Loader voor Tetra Detector
 """
 
+import functools
 import yaml
 from pathlib import Path
-from typing import Dict, Any
+from types import MappingProxyType
+from typing import Dict, Any, Mapping
+
+try:
+    from yaml import CSafeLoader as _SafeLoader
+except ImportError:
+    from yaml import SafeLoader as _SafeLoader
+
+
+def _freeze(value: Any) -> Any:
+    """Maak een read-only kopie van geneste dicts/lists"""
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+def _thaw(value: Any) -> Any:
+    """Maak een muteerbare kopie van een _freeze() resultaat"""
+    if isinstance(value, Mapping):
+        return {key: _thaw(item) for key, item in value.items()}
+    if isinstance(value, tuple):
+        return [_thaw(item) for item in value]
+    return value
 
 class ConfigLoader:
     """Laadt en valideert configuratie files"""
@@ -21,7 +46,7 @@ class ConfigLoader:
         
         try:
             with open(path, 'r') as f:
-                config = yaml.safe_load(f)
+                config = yaml.load(f, Loader=_SafeLoader)
             print(f"✓ Configuratie geladen uit {config_path}")
             
             # Valideer en vul ontbrekende waarden aan
@@ -33,24 +58,26 @@ class ConfigLoader:
     @staticmethod
     def validate_config(config: Dict[str, Any]) -> Dict[str, Any]:
         """Valideer en vul configuratie aan met defaults"""
-        defaults = ConfigLoader.default_config()
-        
-        # Merge met defaults
-        for section in defaults:
-            if section not in config:
-                config[section] = defaults[section]
-            else:
-                # Merge subsections
-                for key in defaults[section]:
-                    if key not in config[section]:
-                        config[section][key] = defaults[section][key]
+        defaults = ConfigLoader._default_config_cached()
         
-        return config
+        # Merge per sectie met defaults; onbekende secties uit de config blijven behouden.
+        # Alleen defaults die de config niet zelf zet worden ontdooid (gewone dicts/lists in het resultaat).
+        merged = {}
+        for section, values in defaults.items():
+            user = config.get(section) or {}
+            merged[section] = {**{key: _thaw(value) for key, value in values.items() if key not in user}, **user}
+        return {**config, **merged}
     
     @staticmethod
     def default_config() -> Dict[str, Any]:
-        """Default configuratie"""
-        return {
+        """Default configuratie (muteerbare kopie)"""
+        return _thaw(ConfigLoader._default_config_cached())
+    
+    @staticmethod
+    @functools.lru_cache(maxsize=1)
+    def _default_config_cached() -> Mapping[str, Any]:
+        """Default configuratie, eenmalig opgebouwd en read-only"""
+        return _freeze({
             'sdr': {
                 'mode': 'single',  # 'single' of 'multi'
                 'devices': [
@@ -68,6 +95,7 @@ class ConfigLoader:
                 'threshold': -50,
                 'scan_interval': 0.5,
                 'samples': 262144,
+                'backend': 'cpu',  # 'cpu' of 'gpu' (CuPy)
                 'adaptive': {
                     'enabled': False,
                     'noise_floor_window': 20,
@@ -87,7 +115,7 @@ class ConfigLoader:
                 'filename_format': 'tetra_detector_%Y%m%d.log',
                 'level': 'INFO'
             }
-        }
+        })
     
     @staticmethod
     def get_device_config(config: Dict[str, Any], device_index: int) -> Dict[str, Any]:
@@ -98,4 +126,4 @@ class ConfigLoader:
             return devices[device_index]
         
         # Return default device config
-        return ConfigLoader.default_config()['sdr']['devices'][0]
\ No newline at end of file
+        return _thaw(ConfigLoader._default_config_cached()['sdr']['devices'][0])
\ No newline at end of file
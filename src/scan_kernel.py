@@ -0,0 +1,114 @@
+"""
+Scan Kernel voor Tetra Detector
+Per-scan update van noise floor, pulse window en detectie voor alle devices
+"""
+
+import math
+import numpy as np
+
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+    
+    def njit(*args, **kwargs):
+        """Zonder numba draaien de kernels gewoon als Python"""
+        def decorator(func):
+            return func
+        return decorator
+
+@njit(cache=True)
+def update_noise_floor(i, power_db, noise_floor, dynamic_threshold, nf_ema, nf_samples, alpha, margin):
+    """Werk de noise floor EMA van device i bij met een non-signal reading"""
+    if math.isnan(nf_ema[i]):
+        nf_ema[i] = power_db
+    else:
+        # (1 - w) * x + w * m als één FMA, met alpha = 1 - w
+        nf_ema[i] += alpha * (power_db - nf_ema[i])
+    
+    if nf_samples[i] < 5:
+        nf_samples[i] += 1
+    
+    # Noise floor pas gebruiken na genoeg non-signal readings
+    if nf_samples[i] >= 5:
+        noise_floor[i] = nf_ema[i]
+        dynamic_threshold[i] = nf_ema[i] + margin
+
+@njit(cache=True)
+def update_pulse_window(i, power_db, now, window, sig_ts, sig_pwr, sig_head, sig_count, peak_in_window, previous_peak):
+    """Voeg een reading toe aan de ring buffer van device i en bepaal de piek in het window"""
+    capacity = sig_ts.shape[1]
+    head = sig_head[i]
+    count = sig_count[i]
+    
+    # Nieuwe reading achteraan (overschrijft de oudste als de buffer vol is)
+    tail = (head + count) % capacity
+    sig_ts[i, tail] = now
+    sig_pwr[i, tail] = power_db
+    if count == capacity:
+        head = (head + 1) % capacity
+    else:
+        count += 1
+    
+    # Readings buiten het pulse window verwijderen
+    # Timestamps zijn oplopend, dus de nieuwe head volgt uit een binary search per segment
+    cutoff_time = now - window
+    end = head + count
+    if end <= capacity:
+        expired = np.searchsorted(sig_ts[i, head:end], cutoff_time)
+    else:
+        expired = np.searchsorted(sig_ts[i, head:], cutoff_time)
+        if expired == capacity - head:
+            expired += np.searchsorted(sig_ts[i, :end - capacity], cutoff_time)
+    head = (head + expired) % capacity
+    count -= expired
+    
+    sig_head[i] = head
+    sig_count[i] = count
+    
+    # Piek in het window (het window kan over het einde van de buffer lopen)
+    if count > 0:
+        previous_peak[i] = peak_in_window[i]
+        end = head + count
+        if end <= capacity:
+            peak_in_window[i] = sig_pwr[i, head:end].max()
+        else:
+            peak_in_window[i] = max(sig_pwr[i, head:].max(), sig_pwr[i, :end - capacity].max())
+    else:
+        peak_in_window[i] = power_db
+
+@njit(cache=True)
+def process_scan(power_db, now, adaptive, alpha, margin, window,
+                 noise_floor, dynamic_threshold, nf_ema, nf_samples,
+                 sig_ts, sig_pwr, sig_head, sig_count, peak_in_window, previous_peak):
+    """
+    Verwerk één scan van alle devices: detectie, noise floor en pulse window.
+    Alle state arrays worden in-place bijgewerkt; return de detectie mask.
+    """
+    num_devices = power_db.shape[0]
+    detected = np.zeros(num_devices, dtype=np.bool_)
+    
+    for i in range(num_devices):
+        # Threshold is de fixed waarde tot er een noise floor is (alleen adaptive)
+        detected[i] = power_db[i] > dynamic_threshold[i]
+        
+        if adaptive and not detected[i]:
+            update_noise_floor(i, power_db[i], noise_floor, dynamic_threshold, nf_ema, nf_samples, alpha, margin)
+        
+        update_pulse_window(i, power_db[i], now, window, sig_ts, sig_pwr, sig_head, sig_count,
+                            peak_in_window, previous_peak)
+    
+    return detected
+
+def warmup():
+    """Compileer de kernels vooraf, zodat de eerste scan niet op de JIT wacht"""
+    if not NUMBA_AVAILABLE:
+        return
+    
+    process_scan(
+        np.zeros(1), 0.0, True, 0.1, 8.0, 4.0,
+        np.full(1, np.nan), np.zeros(1), np.full(1, np.nan), np.zeros(1, dtype=np.int64),
+        np.zeros((1, 2)), np.zeros((1, 2)), np.zeros(1, dtype=np.int64), np.zeros(1, dtype=np.int64),
+        np.zeros(1), np.zeros(1)
+    )
\ No newline at end of file
@@ -2,10 +2,13 @@
 SDR Manager voor Multi-Device Support
 """
 
+import math
 import numpy as np
 from typing import List, Dict, Optional, Any
 import threading
 import time
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor
 
 try:
     from rtlsdr import RtlSdr
@@ -13,15 +16,61 @@ try:
 except ImportError:
     RTL_AVAILABLE = False
 
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+if NUMBA_AVAILABLE:
+    @njit(cache=True, fastmath=True, nogil=True)
+    def _power_db(iq):
+        """Gemiddelde |x|^2 in dB over interleaved I/Q floats, in een enkele pass"""
+        total = 0.0
+        for i in range(iq.size):
+            total += iq[i] * iq[i]
+        return 10.0 * math.log10(total / (iq.size // 2) + 1e-10)
+else:
+    def _power_db(iq):
+        """Gemiddelde |x|^2 in dB over interleaved I/Q floats (BLAS dot)"""
+        return 10.0 * math.log10(float(np.dot(iq, iq)) / (iq.size // 2) + 1e-10)
+
+cp = None  # CuPy, pas geïmporteerd als de GPU backend gekozen is (zware import)
+
+def _load_cupy() -> bool:
+    """Importeer CuPy voor de GPU backend; False als CuPy of een bruikbare CUDA GPU ontbreekt"""
+    global cp
+    try:
+        import cupy
+        # Zonder driver/device faalt pas de eerste GPU operatie, dus nu eenmalig controleren
+        if cupy.cuda.runtime.getDeviceCount() < 1:
+            return False
+    except Exception:
+        return False
+    cp = cupy
+    return True
+
+def _power_db_gpu(raw):
+    """Zelfde power berekening op de GPU; alleen de ruwe bytes gaan heen, alleen de som komt terug"""
+    iq = cp.asarray(raw).astype(cp.float32)
+    iq *= cp.float32(1 / 127.5)
+    iq -= cp.float32(1.0)
+    return 10.0 * math.log10(float(cp.dot(iq, iq)) / (iq.size // 2) + 1e-10)
+
 class SDRDevice:
     """Wrapper voor een enkele RTL-SDR device"""
     
-    def __init__(self, device_config: Dict[str, Any], demo_mode: bool = False):
+    def __init__(self, device_config: Dict[str, Any], demo_mode: bool = False, use_lock: bool = True,
+                 use_gpu: bool = False):
         self.config = device_config
         self.demo_mode = demo_mode
+        self.use_gpu = use_gpu
         self.sdr = None
         self.last_power_db = -80
-        self.lock = threading.Lock()
+        self.error_count = 0  # Aantal mislukte scans
+        self.iq_buffer = None  # Herbruikte float32 buffer voor geschaalde I/Q samples
+        # Lock is alleen nodig als scan() vanuit meerdere threads kan komen
+        self.lock = threading.Lock() if use_lock else nullcontext()
         
         if not demo_mode and RTL_AVAILABLE:
             self.initialize()
@@ -31,6 +80,9 @@ class SDRDevice:
         try:
             self.sdr = RtlSdr(self.config['index'])
             self.configure()
+            if NUMBA_AVAILABLE:
+                # JIT compile nu, niet tijdens de eerste scan
+                _power_db(np.zeros(2, dtype=np.float32))
             print(f"✓ SDR #{self.config['index']} ({self.config['name']}) geïnitialiseerd")
         except Exception as e:
             print(f"❌ Fout bij initialiseren SDR #{self.config['index']}: {e}")
@@ -80,14 +132,25 @@ class SDRDevice:
                     self.last_power_db = base
             else:
                 try:
-                    data = self.sdr.read_samples(samples)
-                    power = np.mean(np.abs(data)**2)
+                    # Lees ruwe 8-bit I/Q bytes i.p.v. read_samples, dat alles naar complex128 upcast
+                    # pyrtlsdr hergebruikt zijn eigen byte buffer, frombuffer maakt geen kopie
+                    raw = np.frombuffer(self.sdr.read_bytes(2 * samples), dtype=np.uint8)
+                    if self.use_gpu:
+                        power_db = _power_db_gpu(raw)
+                    else:
+                        if self.iq_buffer is None or self.iq_buffer.size != raw.size:
+                            self.iq_buffer = np.empty(raw.size, dtype=np.float32)
+                        iq = self.iq_buffer
+                        # (x - 127.5) / 127.5 in-place, zonder tijdelijke arrays
+                        np.multiply(raw, np.float32(1 / 127.5), out=iq)
+                        np.subtract(iq, np.float32(1.0), out=iq)
+                        power_db = _power_db(iq)
                     # Convert to dBm with proper reference level
                     # RTL-SDR gives normalized values, typical reference is around -50 dBFS = -50 dBm
-                    power_db = 10 * np.log10(power + 1e-10)
                     self.last_power_db = power_db - 50  # Adjust to approximate dBm scale
                 except Exception as e:
                     print(f"\n❌ Fout bij scannen SDR #{self.config['index']}: {e}")
+                    self.error_count += 1
                     self.last_power_db = -80
             
             return self.last_power_db
@@ -125,8 +188,16 @@ class SDRManager:
         self.devices: List[SDRDevice] = []
         self.scan_threads: List[threading.Thread] = []
         self.running = False
+        self.threshold = float(self.config['detection']['threshold'])  # Fixed threshold voor scan_all()
+        
+        # Scan meerdere devices tegelijk; read_bytes (USB) en numpy geven de GIL vrij
+        self.parallel = len(self.config['sdr']['devices']) > 1
+        self.executor = None
         
         self.initialize_devices()
+        
+        if self.parallel:
+            self.executor = ThreadPoolExecutor(max_workers=len(self.devices))
     
     def initialize_devices(self):
         """Initialiseer alle SDR devices"""
@@ -134,28 +205,43 @@ class SDRManager:
         
         print(f"\nInitialiseren van {len(device_configs)} SDR device(s)...")
         
+        # Optionele GPU backend voor de power berekening
+        use_gpu = self.config['detection'].get('backend', 'cpu') == 'gpu'
+        if use_gpu and not _load_cupy():
+            print("⚠️  CuPy of CUDA GPU niet beschikbaar, gebruik CPU backend")
+            use_gpu = False
+        
         for device_config in device_configs:
-            device = SDRDevice(device_config, self.demo_mode)
+            device = SDRDevice(device_config, self.demo_mode, use_lock=self.parallel, use_gpu=use_gpu)
             self.devices.append(device)
         
+        # Vaste device gegevens eenmalig, in dezelfde volgorde als scan_power()
+        self.device_indices = np.array([device.config['index'] for device in self.devices])
+        self.device_names = tuple(device.config['name'] for device in self.devices)
+        self.frequencies = np.array([device.config['center_frequency'] for device in self.devices], dtype=np.float64)
+        
         if self.demo_mode:
             print("⚠️  RTL-SDR niet beschikbaar, gebruik DEMO modus")
     
+    def scan_power(self, samples: int = 262144) -> np.ndarray:
+        """Scan alle devices en return power in dBm per device (array)"""
+        if self.executor:
+            futures = [self.executor.submit(device.scan, samples) for device in self.devices]
+            return np.array([future.result() for future in futures], dtype=np.float64)
+        return np.array([device.scan(samples) for device in self.devices], dtype=np.float64)
+    
     def scan_all(self, samples: int = 262144) -> List[Dict[str, Any]]:
         """Scan alle devices en return resultaten"""
-        results = []
+        power_db = self.scan_power(samples)
+        detected = power_db > self.threshold
         
-        for device in self.devices:
-            power_db = device.scan(samples)
-            results.append({
-                'device_index': device.config['index'],
-                'device_name': device.config['name'],
-                'frequency': device.config['center_frequency'],
-                'power_db': power_db,
-                'detected': power_db > self.config['detection']['threshold']
-            })
-        
-        return results
+        return [{
+            'device_index': int(self.device_indices[i]),
+            'device_name': self.device_names[i],
+            'frequency': float(self.frequencies[i]),
+            'power_db': float(power_db[i]),
+            'detected': bool(detected[i])
+        } for i in range(len(self.devices))]
     
     def get_devices_info(self) -> List[Dict[str, Any]]:
         """Haal info op van alle devices"""
@@ -165,11 +251,17 @@ class SDRManager:
         """Return aantal devices"""
         return len(self.devices)
     
+    def get_error_count(self) -> int:
+        """Return totaal aantal mislukte scans over alle devices"""
+        return sum(device.error_count for device in self.devices)
+    
     def is_multi_device(self) -> bool:
         """Check of we meerdere devices gebruiken"""
         return len(self.devices) > 1
     
     def close_all(self):
         """Sluit alle SDR devices"""
+        if self.executor:
+            self.executor.shutdown(wait=True)
         for device in self.devices:
             device.close()
\ No newline at end of file
@@ -4,66 +4,114 @@ Tetra Signal Detector - Multi-SDR Support
 Detecteert RF signalen met ondersteuning voor meerdere RTL-SDR devices
 """
 
+import math
 import time
 from datetime import datetime
 import sys
 import signal
 from pathlib import Path
-from typing import Dict, Any, List
-from collections import deque
+from typing import List, Optional, Tuple
 import numpy as np
 
 from config_loader import ConfigLoader
 from sdr_manager import SDRManager
+import scan_kernel
 from colorama import Fore, Back, Style, init
 
 class TetraDetector:
     """Main detector class met multi-SDR support"""
     
+    TREND_GLYPHS = ("↓", "─", "↑")  # Geïndexeerd met trend index 0/1/2
+    HEADER_RULE = "=" * 100
+    FULL_REPAINT_INTERVAL = 5.0  # Seconden tussen volledige repaints (herstelt tussendoor geprinte tekst, resize)
+    
     def __init__(self, config_path: str = 'configs/config.yml', demo_mode: bool = False):
         self.config = ConfigLoader.load(config_path)
         init()
         self.demo_mode = demo_mode
         self.sdr_manager = SDRManager(self.config, demo_mode)
-        self.detection_counts = {}  # Per device
-        self.total_detections = 0
         self.running = True
         self.log_file = None
+        self._pending_log: List[str] = []  # Log regels van deze scan cyclus, geschreven in flush_log()
         self.display_initialized = False
-        
-        # Adaptive threshold tracking
-        self.noise_floor_history = {}  # Per device: deque of recent power readings
-        self.noise_floor = {}  # Per device: calculated noise floor
-        self.dynamic_threshold = {}  # Per device: dynamic detection threshold
+        self.last_frame_state = None  # Zichtbare waarden van het laatst getekende frame
+        self.prev_lines = None  # Regels van het laatst getekende frame (bovenaan het scherm)
+        self.last_full_repaint = 0.0  # time.monotonic() van de laatste volledige repaint
+        self.last_error_count = 0  # Scan fouten tot nu toe; een nieuwe fout print buiten het frame
+        self.ts_second = None  # Seconde waarvoor ts_hms/ts_full geformatteerd zijn
+        self.ts_hms = ""
+        self.ts_full = ""
         
         # Pulse window tracking for pulsed signals
-        self.pulse_window_seconds = self.config['detection'].get('pulse_window_seconds', 4.0)
-        self.signal_history = {}  # Per device: deque of (timestamp, power_db) tuples
-        self.peak_in_window = {}  # Per device: peak signal strength in window
-        self.previous_peak = {}  # Per device: previous peak for trend detection
-        self.last_detection_peak = {}  # Per device: peak from last detection window
-        self.last_detection_time = {}  # Per device: timestamp of last detection
+        self.pulse_window_seconds = float(self.config['detection'].get('pulse_window_seconds', 4.0))
         
         # Initialize detection counters and adaptive tracking
         adaptive_config = self.config['detection'].get('adaptive', {})
         self.adaptive_enabled = adaptive_config.get('enabled', False)
         self.noise_floor_window = adaptive_config.get('noise_floor_window', 20)
-        self.threshold_margin = adaptive_config.get('threshold_margin', 8)
+        self.threshold_margin = float(adaptive_config.get('threshold_margin', 8))
+        # Auto-regressieve noise floor: m = (1 - w) * x + w * m, met w = exp(-dt / tau).
+        # tau = noise_floor_window scans, dus dt / tau = 1 / noise_floor_window.
+        self.noise_floor_alpha = 1.0 - math.exp(-1.0 / self.noise_floor_window)
         
         # Display configuration
         display_config = self.config.get('display', {})
         self.show_debug_info = display_config.get('show_debug_info', True)
         
-        for i in range(self.sdr_manager.get_device_count()):
-            self.detection_counts[i] = 0
-            self.noise_floor_history[i] = deque(maxlen=self.noise_floor_window)
-            self.noise_floor[i] = None
-            self.dynamic_threshold[i] = self.config['detection']['threshold']
-            self.signal_history[i] = deque()  # No maxlen - we'll trim by time
-            self.peak_in_window[i] = -100.0  # Start with very low value
-            self.previous_peak[i] = -100.0
-            self.last_detection_peak[i] = -100.0  # Start with very low value
-            self.last_detection_time[i] = None  # No detection yet
+        # Config waarden die elke scan nodig zijn eenmalig opzoeken
+        self._scan_interval = float(self.config['detection']['scan_interval'])
+        self._samples = int(self.config['detection']['samples'])
+        self._threshold = float(self.config['detection']['threshold'])
+        self._bar_width = int(display_config['bar_width'])
+        # normalize_power als één vermenigvuldiging + optelling: (p - min) * 100 / (max - min)
+        pmin = float(display_config['power_range_min'])
+        pmax = float(display_config['power_range_max'])
+        self._pnorm_scale = 100.0 / (pmax - pmin)
+        self._pnorm_off = -pmin * self._pnorm_scale
+        self._use_colors = display_config['use_colors']
+        # Regel-diff met cursor posities alleen op een terminal; colorama stript de escapes
+        # bij redirect (file, pipe, systemd), dan blijven alleen volledige frames leesbaar
+        self._diff_render = sys.stdout.isatty()
+        
+        # Kleurcodes eenmalig opzoeken; zonder kleuren lege strings
+        if self._use_colors:
+            self._c_reset = Style.RESET_ALL
+            self._c_green = Fore.GREEN
+            self._c_red = Fore.RED
+            self._c_cyan = Fore.CYAN
+            self._c_dim = Style.DIM
+        else:
+            self._c_reset = self._c_green = self._c_red = self._c_cyan = self._c_dim = ""
+        
+        # Alle mogelijke bar strings vooraf, create_bar doet alleen nog een lookup
+        width = self._bar_width
+        self._bars = tuple('█' * i + '░' * (width - i) for i in range(width + 1))
+        
+        # Per device state als arrays, geïndexeerd op device positie
+        num_devices = self.sdr_manager.get_device_count()
+        self.detection_counts = np.zeros(num_devices, dtype=np.int64)
+        self.noise_floor = np.full(num_devices, np.nan)  # NaN = nog geen noise floor
+        self.dynamic_threshold = np.full(num_devices, self._threshold)
+        
+        # Adaptive threshold tracking
+        self.noise_floor_ema = np.full(num_devices, np.nan)  # EMA van non-signal readings
+        self.noise_floor_samples = np.zeros(num_devices, dtype=np.int64)  # Aantal readings in de EMA (max 5)
+        
+        # Signal history per device als ring buffer: timestamps en power in aparte arrays.
+        # Groot genoeg voor een volledig pulse window bij de ingestelde scan interval;
+        # komen scans sneller dan dat, dan groeit de buffer (ensure_signal_capacity).
+        self.sig_capacity = math.ceil(self.pulse_window_seconds / max(self._scan_interval, 0.01)) + 2
+        self.sig_ts = np.zeros((num_devices, self.sig_capacity))
+        self.sig_pwr = np.zeros((num_devices, self.sig_capacity))
+        self.sig_head = np.zeros(num_devices, dtype=np.int64)  # Index van de oudste reading
+        self.sig_count = np.zeros(num_devices, dtype=np.int64)  # Aantal readings in het window
+        self.peak_in_window = np.full(num_devices, -100.0)  # Peak signal strength in window
+        self.previous_peak = np.full(num_devices, -100.0)  # Previous peak for trend detection
+        self.last_detection_peak = np.full(num_devices, -100.0)  # Peak from last detection window
+        self.last_detection_time = np.full(num_devices, np.nan)  # time.monotonic() of last detection, NaN = nog geen
+        
+        self.setup_display_templates()
+        scan_kernel.warmup()
         
         # Setup logging
         if self.config['logging']['enabled']:
@@ -77,85 +125,132 @@ class TetraDetector:
         filename = datetime.now().strftime(self.config['logging']['filename_format'])
         log_path = log_dir / filename
         
-        self.log_file = open(log_path, 'a')
+        # Grote buffer; schrijven en flushen gebeurt hooguit eens per scan cyclus in flush_log()
+        self.log_file = open(log_path, 'a', buffering=65536, encoding='utf-8')
         self.log(f"=== Tetra Detector gestart om {datetime.now()} ===")
         
         # Log device info
         for device_info in self.sdr_manager.get_devices_info():
             self.log(f"Device #{device_info['index']}: {device_info['name']} @ {device_info['frequency']} MHz ({device_info['mode']})")
         
-        self.log(f"Threshold: {self.config['detection']['threshold']} dBm")
+        self.log(f"Threshold: {self._threshold:g} dBm")
+        self.flush_log()
         print(f"✓ Logging naar: {log_path}")
     
-    def log(self, message: str):
+    def setup_display_templates(self):
+        """Bouw de vaste delen van de display regels eenmalig op"""
+        reset, cyan, dim = self._c_reset, self._c_cyan, self._c_dim
+        
+        # Vaste regels van het frame
+        self._border_line = f"\033[2K{cyan}{'═'*63}{reset}"
+        self._debug_title_line = f"\033[2K{cyan}  Debug information:{reset}"
+        self._table_header_line = (f"\033[2K   {dim}│{reset} Current   {dim}│{reset} Peak     {dim}│{reset} Gain "
+                                   f"{dim}│{reset}    NF  {dim}│{reset} Threshold")
+        self._table_rule_line = f"\033[2K{dim}───╬───────────┼──────────┼──────┼────────┼────────────────{reset}"
+        
+        # Alleen de waarden die per frame veranderen blijven als {placeholder} over
+        self._tmpl_status = f"\033[2K{cyan} {reset} │ {{timestamp}} │ {{status_color}}{{status_text}}{reset}"
+        self._tmpl_bar = f"\033[2K{{bar_color}}  {{bar}}  {{power:>6.1f}} dBm{reset}"
+        
+        # Gain verandert niet na configure(), dus die gaat direct in de device regel
+        self._tmpl_rows = []
+        for device_idx, info in enumerate(self.sdr_manager.get_devices_info()):
+            gain = str(info['gain']).ljust(4)
+            self._tmpl_rows.append(
+                f"\033[2K{{row_color}}#{device_idx+1} {dim}│{reset} {{power:>6.1f}} dBm {dim}│{reset} "
+                f"{{peak:>6.1f}} {{trend}} {dim}│{reset} {gain} {dim}│{reset} {{nf}} {dim}│{reset} {{thr}}{reset}"
+            )
+    
+    def log(self, message: str, timestamp: Optional[str] = None):
         """Log message naar file"""
         if self.log_file:
-            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            self.log_file.write(f"[{timestamp}] {message}\n")
+            if timestamp is None:
+                timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            self._pending_log.append(f"[{timestamp}] {message}\n")
+    
+    def flush_log(self):
+        """Schrijf gebufferde log regels in één keer naar disk"""
+        if self.log_file and self._pending_log:
+            self.log_file.write(''.join(self._pending_log))
             self.log_file.flush()
+            self._pending_log.clear()
     
     def create_bar(self, value: float, max_value: float = 100) -> str:
         """Maak text-based progress bar"""
-        width = self.config['display']['bar_width']
-        percentage = min(100, max(0, (value / max_value) * 100))
-        filled = int((percentage / 100) * width)
-        bar = '█' * filled + '░' * (width - filled)
-        return f"[{bar}] {percentage:.0f}%"
+        if value < 0:
+            percentage = 0
+        elif value > max_value:
+            percentage = 100
+        else:
+            percentage = value / max_value * 100
+        filled = int(percentage / 100 * self._bar_width)  # Zelfde afronding als voorheen; 100% vult de hele bar
+        return f"[{self._bars[filled]}] {percentage:.0f}%"
     
     def normalize_power(self, power_db: float) -> float:
         """Normaliseer power naar 0-100%"""
-        min_db = self.config['display']['power_range_min']
-        max_db = self.config['display']['power_range_max']
-        normalized = ((power_db - min_db) / (max_db - min_db)) * 100
-        return max(0, min(100, normalized))
+        normalized = power_db * self._pnorm_scale + self._pnorm_off
+        if normalized < 0:
+            return 0.0
+        if normalized > 100:
+            return 100.0
+        return normalized
     
-    def display_status(self, results: List[Dict[str, Any]]):
-        """Toon status in CLI voor alle devices - fixed position display"""
-        timestamp = datetime.now().strftime("%H:%M:%S")
-        use_colors = self.config['display']['use_colors']
-        
-        detected_any = any(result['detected'] for result in results)
-        
-        if use_colors:
-            reset = Style.RESET_ALL
-            green = Fore.GREEN
-            red = Fore.RED
-            yellow = Fore.YELLOW
-            cyan = Fore.CYAN
-            dim = Style.DIM
-        else:
-            reset = green = red = yellow = cyan = dim = ""
-        
-        devices_info = self.sdr_manager.get_devices_info()
-        is_multi = self.sdr_manager.is_multi_device()
+    def ensure_signal_capacity(self, now: float):
+        """Verdubbel de ring buffer als een volle buffer nog alleen readings binnen het pulse window bevat"""
+        rows = np.arange(self.sig_ts.shape[0])
+        oldest = self.sig_ts[rows, self.sig_head]
+        in_window = (self.sig_count == self.sig_capacity) & (oldest >= now - self.pulse_window_seconds)
+        if not in_window.any():
+            return
         
-        # Calculate number of lines needed
-        lines_needed = 6  # Fixed layout: header(3) + status(2) + bottom border(1)
-        if self.show_debug_info:
-            lines_needed += 6  # Debug section: header(2) + table header(2) + device rows + bottom border(1)
-            if is_multi:
-                lines_needed += 1  # Extra line for second device
+        # Readings op volgorde (oudste eerst) vooraan in de nieuwe arrays, head wordt 0
+        capacity = self.sig_capacity
+        order = (self.sig_head[:, None] + np.arange(capacity)) % capacity
+        sig_ts = np.zeros((len(rows), 2 * capacity))
+        sig_pwr = np.zeros((len(rows), 2 * capacity))
+        sig_ts[:, :capacity] = self.sig_ts[rows[:, None], order]
+        sig_pwr[:, :capacity] = self.sig_pwr[rows[:, None], order]
+        
+        self.sig_capacity = 2 * capacity
+        self.sig_ts = sig_ts
+        self.sig_pwr = sig_pwr
+        self.sig_head[:] = 0
+    
+    def format_timestamps(self, now: float) -> Tuple[str, str]:
+        """Wall-clock strings voor display en log; alleen opnieuw formatteren als de seconde verandert"""
+        second = int(now)
+        if second != self.ts_second:
+            local = time.localtime(second)
+            self.ts_second = second
+            self.ts_hms = time.strftime("%H:%M:%S", local)
+            self.ts_full = time.strftime("%Y-%m-%d %H:%M:%S", local)
+        return self.ts_hms, self.ts_full
+    
+    def display_status(self, power_db: np.ndarray, detected: np.ndarray, threshold: np.ndarray,
+                       noise_floor: np.ndarray, timestamp: Optional[str] = None, now: Optional[float] = None):
+        """Toon status in CLI voor alle devices - fixed position display"""
+        if timestamp is None:
+            timestamp = datetime.now().strftime("%H:%M:%S")
+        if now is None:
+            now = time.monotonic()
         
-        # Clear screen and move to top if display was initialized
-        if self.display_initialized:
-            print("\033[2J\033[H", end='')  # Clear screen and move cursor to top
+        detected_any = bool(detected.any())
+        red = self._c_red
+        green = self._c_green
         
         # Main display - show signal from last detection/pulse window
-        main_result = results[0]
-        
         # Check if last detection is still valid (within pulse_window + 1 second)
-        current_time = time.time()
         reset_timeout = self.pulse_window_seconds + 1.0
         
-        if (self.last_detection_time[0] is not None and 
+        if (not np.isnan(self.last_detection_time[0]) and 
             self.last_detection_peak[0] > -90 and 
-            current_time - self.last_detection_time[0] <= reset_timeout):
+            now - self.last_detection_time[0] <= reset_timeout):
             # Valid recent detection
             display_power = self.last_detection_peak[0]
             display_label = "Last Detection"
         else:
             # No recent detection or timed out - show noise floor or default
-            if self.noise_floor[0] is not None:
+            if not np.isnan(self.noise_floor[0]):
                 display_power = self.noise_floor[0]  # Use established noise floor
             else:
                 display_power = -80.0  # Default baseline when no noise floor established
@@ -169,53 +264,85 @@ class TetraDetector:
         status_text = "DETECTING!" if detected_any else display_label
         status_color = red if detected_any else green
         
+        # Sla de redraw over als niets zichtbaars veranderde (waarden op display precisie)
+        frame_state = (timestamp, status_text, round(normalized), round(display_power * 10))
+        if self.show_debug_info:
+            # Trend voor alle devices tegelijk: 0 = dalend, 1 = stabiel (±1 dB), 2 = stijgend
+            delta = self.peak_in_window - self.previous_peak
+            trend_idx = (delta > 1).astype(np.int8) - (delta < -1) + 1
+            values = np.round(np.concatenate((power_db, self.peak_in_window, noise_floor, threshold)) * 10)
+            frame_state += (values.tobytes(), detected.tobytes(), trend_idx.tobytes())
+        if self.prev_lines is not None and frame_state == self.last_frame_state:
+            return
+        self.last_frame_state = frame_state
+        
+        # Bouw het frame als lijst regels; alleen gewijzigde regels gaan naar de terminal
+        lines = []
+        
         # Build display
-        print(f"\033[2K{cyan}{'═'*63}{reset}")
-        print(f"\033[2K{cyan} {reset} │ {timestamp} │ {status_color}{status_text}{reset}")
-        print(f"\033[2K{cyan}{'═'*63}{reset}")
-        print(f"\033[2K")
-        print(f"\033[2K{bar_color}  {bar}  {display_power:>6.1f} dBm{reset}")
-        print(f"\033[2K")
+        lines.append(self._border_line)
+        lines.append(self._tmpl_status.format(timestamp=timestamp, status_color=status_color, status_text=status_text))
+        lines.append(self._border_line)
+        lines.append("\033[2K")
+        lines.append(self._tmpl_bar.format(bar_color=bar_color, bar=bar, power=display_power))
+        lines.append("\033[2K")
         
         # Debug information section (conditional)
         if self.show_debug_info:
-            print(f"\033[2K{cyan}{'═'*63}{reset}")
-            print(f"\033[2K{cyan}  Debug information:{reset}")
-            print(f"\033[2K{cyan}{'═'*63}{reset}")
+            lines.append(self._border_line)
+            lines.append(self._debug_title_line)
+            lines.append(self._border_line)
             
             # Table header
-            print(f"\033[2K   {dim}│{reset} Current   {dim}│{reset} Peak     {dim}│{reset} Gain {dim}│{reset}    NF  {dim}│{reset} Threshold")
-            print(f"\033[2K{dim}───╬───────────┼──────────┼──────┼────────┼────────────────{reset}")
+            lines.append(self._table_header_line)
+            lines.append(self._table_rule_line)
             
             # Table rows - one per device
-            for result in results:
-                device_idx = result['device_index']
+            trends = [self.TREND_GLYPHS[i] for i in trend_idx.tolist()]
+            for device_idx in range(len(power_db)):
                 peak = self.peak_in_window[device_idx]
-                prev_peak = self.previous_peak[device_idx]
-                trend = "↑" if peak > prev_peak + 1 else "↓" if peak < prev_peak - 1 else "─"
-                
-                gain = str(devices_info[device_idx]['gain']).ljust(4)
+                trend = trends[device_idx]
                 
                 # Color the row if this device detected
-                row_color = red if result['detected'] else ""
+                row_color = red if detected[device_idx] else ""
                 
-                nf_str = f"{result['noise_floor']:>6.1f}" if result.get('noise_floor') is not None else "    --"
-                thr_str = f"{result['threshold']:>6.1f}" if result.get('threshold') is not None else "    --"
+                nf_str = "    --" if np.isnan(noise_floor[device_idx]) else f"{noise_floor[device_idx]:>6.1f}"
+                thr_str = f"{threshold[device_idx]:>6.1f}"
                 
-                print(f"\033[2K{row_color}#{device_idx+1} {dim}│{reset} {result['power_db']:>6.1f} dBm {dim}│{reset} {peak:>6.1f} {trend} {dim}│{reset} {gain} {dim}│{reset} {nf_str} {dim}│{reset} {thr_str}{reset}")
+                lines.append(self._tmpl_rows[device_idx].format(
+                    row_color=row_color, power=power_db[device_idx], peak=peak,
+                    trend=trend, nf=nf_str, thr=thr_str
+                ))
             
-            print(f"\033[2K{cyan}{'═'*63}{reset}")
+            lines.append(self._border_line)
+        else:
+            lines.append(self._border_line)
+        
+        if (self._diff_render and self.prev_lines is not None and len(lines) == len(self.prev_lines) and
+            now - self.last_full_repaint < self.FULL_REPAINT_INTERVAL):
+            # Alleen gewijzigde regels overschrijven, via absolute cursor positie
+            parts = [f"\033[{row}H{line}" for row, (line, prev) in enumerate(zip(lines, self.prev_lines), start=1)
+                     if line != prev]
+            parts.append(f"\033[{len(lines) + 1}H")  # Cursor terug onder het frame
         else:
-            print(f"\033[2K{cyan}{'═'*63}{reset}")
+            # Volledig frame; clear screen and move to top if display was initialized
+            parts = ["\033[2J\033[H"] if self.display_initialized else []
+            parts.append('\n'.join(lines) + '\n')
+            self.last_full_repaint = now
         
+        # Eén write per frame via sys.stdout, zodat colorama ANSI codes kan strippen/converteren
+        sys.stdout.write(''.join(parts))
         sys.stdout.flush()
+        
+        # Het eerste frame staat onder de header, pas vanaf de volgende repaint staat het frame bovenaan
+        self.prev_lines = lines if self.display_initialized else None
         self.display_initialized = True
     
     def print_header(self):
         """Print header met device info"""
-        print("\n" + "="*100)
+        print("\n" + self.HEADER_RULE)
         print("  Multi-SDR RF Signal Monitor")
-        print("="*100)
+        print(self.HEADER_RULE)
         
         devices_info = self.sdr_manager.get_devices_info()
         
@@ -229,130 +356,129 @@ class TetraDetector:
             print(f"    [{info['index']}] {info['name']}: {info['frequency']} MHz @ {info['sample_rate']} MS/s {mode_str}")
         
         if self.adaptive_enabled:
-            print(f"  Threshold: ADAPTIVE (margin: +{self.threshold_margin} dBm from noise floor)")
+            print(f"  Threshold: ADAPTIVE (margin: +{self.threshold_margin:g} dBm from noise floor)")
         else:
-            print(f"  Threshold: {self.config['detection']['threshold']} dBm (FIXED)")
-        print("="*100 + "\n")
+            print(f"  Threshold: {self._threshold:g} dBm (FIXED)")
+        print(self.HEADER_RULE + "\n")
         print("Druk Ctrl+C om te stoppen\n")
     
-    def update_noise_floor(self, device_index: int, power_db: float, is_signal: bool = False):
-        """Update noise floor calculation for a device"""
-        if not self.adaptive_enabled:
-            return
-        
-        # Only add to noise floor history if it's not a detected signal
-        if not is_signal:
-            self.noise_floor_history[device_index].append(power_db)
-        
-        # Calculate noise floor from recent non-signal readings
-        if len(self.noise_floor_history[device_index]) >= 5:
-            # Use median to be robust against outliers
-            self.noise_floor[device_index] = np.median(list(self.noise_floor_history[device_index]))
-            # Set dynamic threshold: noise floor + margin
-            self.dynamic_threshold[device_index] = self.noise_floor[device_index] + self.threshold_margin
-    
-    def update_pulse_window(self, device_index: int, power_db: float):
-        """Update signal history and track peak signal in time window"""
-        current_time = time.time()
-        
-        # Add current reading to history
-        self.signal_history[device_index].append((current_time, power_db))
-        
-        # Remove old readings outside the pulse window
-        cutoff_time = current_time - self.pulse_window_seconds
-        while self.signal_history[device_index] and self.signal_history[device_index][0][0] < cutoff_time:
-            self.signal_history[device_index].popleft()
-        
-        # Calculate peak signal in the window
-        if self.signal_history[device_index]:
-            self.previous_peak[device_index] = self.peak_in_window[device_index]
-            self.peak_in_window[device_index] = max(
-                reading[1] for reading in self.signal_history[device_index]
-            )
-        else:
-            self.peak_in_window[device_index] = power_db
-    
     def run(self):
         """Main detection loop"""
         self.print_header()
         
+        # Vaste cadans: scan k start op t0 + k * scan_interval, ongeacht hoe lang een scan duurde
+        interval = self._scan_interval
+        t0 = time.monotonic()
+        tick = 0
+        
         try:
             while self.running:
                 # Scan alle devices
-                results = self.sdr_manager.scan_all(self.config['detection']['samples'])
+                power_db = self.sdr_manager.scan_power(self._samples)
+                
+                # Een scan fout is over het frame heen geprint: volgende frame volledig opnieuw tekenen
+                error_count = self.sdr_manager.get_error_count()
+                if error_count != self.last_error_count:
+                    self.last_error_count = error_count
+                    self.prev_lines = None
+                
+                # Eén timestamp per scan cyclus voor display en log
+                # (monotonic voor intervallen, wall-clock alleen voor de tekst)
+                now = time.monotonic()
+                ts_hms, ts_full = self.format_timestamps(time.time())
                 
-                # Update noise floor and check for detections
-                for result in results:
-                    device_idx = result['device_index']
-                    
-                    # For adaptive mode, use dynamic threshold
-                    if self.adaptive_enabled and self.noise_floor[device_idx] is not None:
-                        result['threshold'] = self.dynamic_threshold[device_idx]
-                        result['detected'] = result['power_db'] > self.dynamic_threshold[device_idx]
-                        result['noise_floor'] = self.noise_floor[device_idx]
-                    else:
-                        result['threshold'] = self.config['detection']['threshold']
-                        result['noise_floor'] = None
-                    
-                    # Update noise floor tracking
-                    self.update_noise_floor(device_idx, result['power_db'], result['detected'])
-                    
-                    # Update pulse window tracking
-                    self.update_pulse_window(device_idx, result['power_db'])
-                    
-                    if result['detected']:
-                        self.detection_counts[device_idx] += 1
-                        self.total_detections += 1
-                        
-                        # Store the peak from this detection window
-                        self.last_detection_peak[device_idx] = self.peak_in_window[device_idx]
-                        # Record the timestamp of this detection
-                        self.last_detection_time[device_idx] = time.time()
-                        
-                        # Log detectie (to file only, no console print)
-                        msg = (f"⚠️  [{datetime.now().strftime('%H:%M:%S')}] "
-                              f"{result['device_name']}: Signaal gedetecteerd op "
-                              f"{result['frequency']:.2f} MHz @ {result['power_db']:.1f} dBm")
-                        if self.adaptive_enabled and result['noise_floor'] is not None:
-                            msg += f" (noise floor: {result['noise_floor']:.1f} dBm, threshold: {result['threshold']:.1f} dBm)"
-                        self.log(msg)
+                # Threshold en noise floor zoals gebruikt voor deze scan, voor log en display
+                threshold = self.dynamic_threshold.copy()
+                noise_floor = self.noise_floor.copy()
+                
+                # Volle ring buffer mag alleen een verlopen reading overschrijven
+                if (self.sig_count == self.sig_capacity).any():
+                    self.ensure_signal_capacity(now)
+                
+                # Detectie, noise floor en pulse window voor alle devices in één kernel call
+                detected = scan_kernel.process_scan(
+                    power_db, now, self.adaptive_enabled, self.noise_floor_alpha,
+                    self.threshold_margin, self.pulse_window_seconds,
+                    self.noise_floor, self.dynamic_threshold, self.noise_floor_ema, self.noise_floor_samples,
+                    self.sig_ts, self.sig_pwr, self.sig_head, self.sig_count,
+                    self.peak_in_window, self.previous_peak
+                )
+                
+                self.detection_counts += detected
+                
+                # Store the peak from this detection window and record its timestamp
+                self.last_detection_peak[detected] = self.peak_in_window[detected]
+                self.last_detection_time[detected] = now
+                
+                for device_idx in np.flatnonzero(detected):
+                    # Log detectie (to file only, no console print)
+                    msg = (f"⚠️  [{ts_hms}] "
+                          f"{self.sdr_manager.device_names[device_idx]}: Signaal gedetecteerd op "
+                          f"{self.sdr_manager.frequencies[device_idx]:.2f} MHz @ {power_db[device_idx]:.1f} dBm")
+                    if self.adaptive_enabled and not np.isnan(noise_floor[device_idx]):
+                        msg += f" (noise floor: {noise_floor[device_idx]:.1f} dBm, threshold: {threshold[device_idx]:.1f} dBm)"
+                    self.log(msg, ts_full)
+                
+                # Gestopt tijdens deze scan: geen frame meer over de stop melding heen tekenen
+                if not self.running:
+                    break
                 
                 # Display status
-                self.display_status(results)
+                self.display_status(power_db, detected, threshold, noise_floor, ts_hms, now)
+                self.flush_log()
                 
-                # Sleep
-                time.sleep(self.config['detection']['scan_interval'])
+                # Sleep tot de volgende tick; bij achterstand gemiste ticks overslaan i.p.v. inhalen
+                tick += 1
+                delay = t0 + tick * interval - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                elif interval > 0:
+                    tick += int(-delay // interval)
                 
         except KeyboardInterrupt:
-            self.cleanup()
-            print("\n✓ Detector gestopt")
+            pass  # Backup als er geen SIGINT handler geïnstalleerd is
+        
+        self.cleanup()
+        print("\n✓ Detector gestopt")
+    
+    def stop(self, sig=None, frame=None):
+        """Handle Ctrl+C gracefully: stop na de huidige scan, cleanup loopt daarna in run()"""
+        print("\n\nStoppen...")
+        self.running = False
+        # Een tweede Ctrl+C breekt direct af (bv. als een USB read blijft hangen)
+        signal.signal(signal.SIGINT, signal.default_int_handler)
     
     def cleanup(self):
         """Cleanup resources"""
         self.sdr_manager.close_all()
         
-        print(f"Totaal detecties: {self.total_detections}")
+        # Totaal pas hier uit de per device tellers, niet elke scan bijhouden
+        total_detections = int(self.detection_counts.sum())
+        print(f"Totaal detecties: {total_detections}")
         
         if self.sdr_manager.is_multi_device():
             print("Per device:")
-            for idx, count in self.detection_counts.items():
-                devices = self.sdr_manager.get_devices_info()
-                name = devices[idx]['name'] if idx < len(devices) else f"Device {idx}"
+            for name, count in zip(self.sdr_manager.device_names, self.detection_counts.tolist()):
                 print(f"  {name}: {count}")
         
-        self.log(f"Detector gestopt. Totaal detecties: {self.total_detections}")
+        self.log(f"Detector gestopt. Totaal detecties: {total_detections}")
         
         if self.log_file:
+            self.flush_log()
             self.log_file.close()
 
-def signal_handler(sig, frame):
-    """Handle Ctrl+C gracefully"""
-    print("\n\nStoppen...")
-    sys.exit(0)
-
 def main():
     """Main entry point"""
-    signal.signal(signal.SIGINT, signal_handler)
+    # Ctrl+C tijdens het opstarten (SDRs openen, JIT warmup) onthouden i.p.v. halverwege afbreken,
+    # zodat de geopende devices daarna netjes gesloten worden
+    startup_interrupted = False
+    
+    def startup_handler(sig, frame):
+        nonlocal startup_interrupted
+        print("\n\nStoppen...")
+        startup_interrupted = True
+    
+    signal.signal(signal.SIGINT, startup_handler)
     
     # Parse argumenten
     config_path = 'configs/config.yml'
@@ -364,6 +490,11 @@ def main():
     
     # Start detector
     detector = TetraDetector(config_path=config_path, demo_mode=demo)
+    if startup_interrupted:
+        detector.cleanup()
+        return
+    
+    signal.signal(signal.SIGINT, detector.stop)
     detector.run()
 
 if __name__ == "__main__":